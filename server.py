@@ -6,185 +6,210 @@ Uses a simple HTTP/SSE approach similar to the Node.js MCP SDK pattern.
 """
 
 import os
-import random
-import json
-import uuid
+import secrets
 import asyncio
-from typing import Dict, Any, Optional
+import atexit
+import logging
+import logging.handlers
+import queue
+import time
+from contextlib import asynccontextmanager, suppress
+from dataclasses import dataclass
+from typing import Dict, Any, Optional, Union
 from urllib.parse import urlparse
 
 from fastapi import FastAPI, Request, Query, Response
-from fastapi.responses import JSONResponse
-from sse_starlette.sse import EventSourceResponse
+from fastapi.responses import JSONResponse, StreamingResponse
+import httpx
+import orjson
 import uvicorn
 
+from tools import TOOLS, handle_tool_call
+
+# Configure logging: records are queued on the event loop thread and
+# formatted/written by a background listener thread.
+LOG_LEVEL = os.getenv("LOG_LEVEL", "WARNING").upper()
+
+_log_queue: queue.SimpleQueue = queue.SimpleQueue()
+_log_handler = logging.StreamHandler()
+_log_handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+_log_listener = logging.handlers.QueueListener(_log_queue, _log_handler)
+_log_listener.start()
+atexit.register(_log_listener.stop)
+
+logger = logging.getLogger(__name__)
+logger.setLevel(LOG_LEVEL)
+logger.addHandler(logging.handlers.QueueHandler(_log_queue))
+logger.propagate = False
+
+class FastJSONResponse(JSONResponse):
+    """JSON response rendered with orjson."""
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content)
+
+# Seconds between SSE keepalive comments on an idle stream
+SSE_KEEPALIVE_INTERVAL = 30.0
+
+# Lower bound on the reaper sweep period, so it cannot spin the event loop
+MIN_REAP_INTERVAL = 1.0
+
+# Sessions with no client activity for this long are reaped. Keepalives are
+# what refresh an idle listener, so the timeout must leave room for them.
+SESSION_IDLE_TIMEOUT = float(os.getenv("SESSION_IDLE_TIMEOUT", "300"))
+if SESSION_IDLE_TIMEOUT < 2 * SSE_KEEPALIVE_INTERVAL:
+    logger.warning(
+        "SESSION_IDLE_TIMEOUT=%s is below twice the keepalive interval; using %s",
+        SESSION_IDLE_TIMEOUT, 2 * SSE_KEEPALIVE_INTERVAL
+    )
+    SESSION_IDLE_TIMEOUT = 2 * SSE_KEEPALIVE_INTERVAL
+SESSION_REAP_INTERVAL = float(os.getenv("SESSION_REAP_INTERVAL", "60"))
+if SESSION_REAP_INTERVAL < MIN_REAP_INTERVAL:
+    logger.warning(
+        "SESSION_REAP_INTERVAL=%s is below the minimum; using %s",
+        SESSION_REAP_INTERVAL, MIN_REAP_INTERVAL
+    )
+    SESSION_REAP_INTERVAL = MIN_REAP_INTERVAL
+
+async def _reap_sessions() -> None:
+    """Periodically drop sessions whose client has gone quiet."""
+    while True:
+        await asyncio.sleep(SESSION_REAP_INTERVAL)
+        cutoff = time.monotonic() - SESSION_IDLE_TIMEOUT
+        stale = [sid for sid, session in active_sessions.items() if session.last_seen < cutoff]
+        for sid in stale:
+            session = active_sessions.pop(sid)
+            # Release queued responses; the SSE loop exits on its next wakeup
+            while True:
+                try:
+                    session.queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    break
+            logger.info("Reaped stale session: %s", sid)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Shared outbound HTTP client; tools that call external APIs should use
+    # this instead of opening a client (and TCP/TLS connection) per call
+    app.state.http = httpx.AsyncClient(
+        limits=httpx.Limits(max_connections=100, max_keepalive_connections=50),
+        timeout=10.0
+    )
+    reaper = asyncio.create_task(_reap_sessions())
+    try:
+        yield
+    finally:
+        reaper.cancel()
+        with suppress(asyncio.CancelledError):
+            await reaper
+        await app.state.http.aclose()
+
 # Create FastAPI app
-app = FastAPI(title="Text Utilities MCP Python")
+app = FastAPI(
+    title="Text Utilities MCP Python",
+    lifespan=lifespan
+)
+
+def _resolve_message_endpoint() -> str:
+    """Get message endpoint path from env or use default."""
+    message_endpoint = os.getenv("MESSAGE_ENDPOINT", "/message")
+    
+    # If MESSAGE_ENDPOINT is a full URL, extract just the path
+    try:
+        parsed = urlparse(message_endpoint)
+        if parsed.scheme:  # It's a full URL
+            message_endpoint = parsed.path or "/message"
+        logger.debug("Using message endpoint: %s", message_endpoint)
+    except Exception:
+        logger.debug("Using message endpoint as-is: %s", message_endpoint)
+    return message_endpoint
+
+# Resolved once; the environment does not change after startup
+MESSAGE_ENDPOINT_PATH = _resolve_message_endpoint()
+ENDPOINT_URL_TEMPLATE = MESSAGE_ENDPOINT_PATH.replace("{", "{{").replace("}", "}}") + "?sessionId={session_id}"
+
+# SSE framing
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    "Connection": "keep-alive",
+    # Disable response buffering on Nginx-style reverse proxies
+    "X-Accel-Buffering": "no",
+}
+SSE_KEEPALIVE = b": keepalive\n\n"
+
+def sse_frame(event: str, data: bytes) -> bytes:
+    """Format a single SSE event frame."""
+    return b"event: " + event.encode() + b"\ndata: " + data + b"\n\n"
+
+@dataclass(slots=True)
+class Session:
+    """State for a single SSE client."""
+    queue: asyncio.Queue
+    created_at: float
+    last_seen: float
+
+# Maximum number of undelivered responses buffered per session
+SESSION_QUEUE_SIZE = int(os.getenv("SESSION_QUEUE_SIZE", "128"))
 
 # Store active sessions
-active_sessions: Dict[str, asyncio.Queue] = {}
-
-# Define tools
-TOOLS = [
-    {
-        "name": "reverse_text",
-        "description": "Reverses the order of characters in the given text",
-        "inputSchema": {
-            "type": "object",
-            "properties": {
-                "text": {
-                    "type": "string",
-                    "description": "The text to reverse",
-                }
-            },
-            "required": ["text"],
-        },
-    },
-    {
-        "name": "uppercase_text",
-        "description": "Converts text to uppercase",
-        "inputSchema": {
-            "type": "object",
-            "properties": {
-                "text": {
-                    "type": "string",
-                    "description": "The text to convert to uppercase",
-                }
-            },
-            "required": ["text"],
-        },
-    },
-    {
-        "name": "lowercase_text",
-        "description": "Converts text to lowercase",
-        "inputSchema": {
-            "type": "object",
-            "properties": {
-                "text": {
-                    "type": "string",
-                    "description": "The text to convert to lowercase",
-                }
-            },
-            "required": ["text"],
-        },
-    },
-    {
-        "name": "word_count",
-        "description": "Counts the number of words in the given text",
-        "inputSchema": {
-            "type": "object",
-            "properties": {
-                "text": {
-                    "type": "string",
-                    "description": "The text to count words in",
-                }
-            },
-            "required": ["text"],
-        },
-    },
-    {
-        "name": "character_count",
-        "description": "Counts the number of characters (including spaces) in the given text",
-        "inputSchema": {
-            "type": "object",
-            "properties": {
-                "text": {
-                    "type": "string",
-                    "description": "The text to count characters in",
-                }
-            },
-            "required": ["text"],
-        },
-    },
-    {
-        "name": "shuffle_text",
-        "description": "Randomly shuffles the characters in the given text",
-        "inputSchema": {
-            "type": "object",
-            "properties": {
-                "text": {
-                    "type": "string",
-                    "description": "The text to shuffle",
-                }
-            },
-            "required": ["text"],
-        },
+active_sessions: Dict[str, Session] = {}
+
+# Static payloads, built once. Responses only ever serialize these, so the
+# same objects are shared across requests.
+SERVER_NAME = "text-utilities-mcp-python"
+SERVER_VERSION = "1.0.0"
+PROTOCOL_VERSION = "2024-11-05"
+
+_INIT_RESULT = {
+    "protocolVersion": PROTOCOL_VERSION,
+    "capabilities": {
+        "tools": {}
     },
-]
+    "serverInfo": {
+        "name": SERVER_NAME,
+        "version": SERVER_VERSION
+    }
+}
+_TOOLS_RESULT = {"tools": TOOLS}
+_TOOLS_RESULT_JSON = orjson.dumps(_TOOLS_RESULT)
 
-def handle_tool_call(name: str, arguments: Dict[str, Any]) -> Dict[str, Any]:
-    """Handle tool execution."""
-    text = arguments.get("text", "")
-    
-    if name == "reverse_text":
-        result = text[::-1]
-        return {"content": [{"type": "text", "text": f"Reversed text: {result}"}]}
-    
-    elif name == "uppercase_text":
-        result = text.upper()
-        return {"content": [{"type": "text", "text": f"Uppercase: {result}"}]}
-    
-    elif name == "lowercase_text":
-        result = text.lower()
-        return {"content": [{"type": "text", "text": f"Lowercase: {result}"}]}
-    
-    elif name == "word_count":
-        words = [w for w in text.split() if w]
-        count = len(words)
-        plural = "s" if count != 1 else ""
-        return {"content": [{"type": "text", "text": f"Word count: {count} word{plural}"}]}
-    
-    elif name == "character_count":
-        count = len(text)
-        plural = "s" if count != 1 else ""
-        return {"content": [{"type": "text", "text": f"Character count: {count} character{plural}"}]}
-    
-    elif name == "shuffle_text":
-        chars = list(text)
-        random.shuffle(chars)
-        result = "".join(chars)
-        return {"content": [{"type": "text", "text": f"Shuffled text: {result}"}]}
-    
-    else:
-        return {"content": [{"type": "text", "text": f"Unknown tool: {name}"}], "isError": True}
+# Methods whose result never changes: method -> serialized result
+_STATIC_RESULTS: Dict[str, bytes] = {
+    "initialize": orjson.dumps(_INIT_RESULT),
+    "tools/list": _TOOLS_RESULT_JSON,
+    "ping": b"{}",
+}
+_HEALTH_TOOL_NAMES = tuple(tool["name"] for tool in TOOLS)
+
+# A response is either a dict or an already serialized JSON-RPC message
+MCPResponse = Union[Dict[str, Any], bytes]
+
+def encode_message(message: MCPResponse) -> bytes:
+    """Serialize a response, passing pre-serialized bytes through."""
+    if isinstance(message, bytes):
+        return message
+    return orjson.dumps(message)
 
-def handle_message(message: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+def _result_bytes(msg_id: Any, result_json: bytes) -> bytes:
+    """Splice a pre-serialized result into a JSON-RPC response."""
+    return b'{"jsonrpc":"2.0","id":' + orjson.dumps(msg_id) + b',"result":' + result_json + b'}'
+
+def handle_message(message: Dict[str, Any]) -> Optional[MCPResponse]:
     """Handle incoming MCP messages and return response."""
     method = message.get("method")
     msg_id = message.get("id")
     params = message.get("params", {})
     
-    print(f"Handling message: method={method}, id={msg_id}")
+    logger.debug("Handling message: method=%s, id=%s", method, msg_id)
     
-    if method == "initialize":
-        return {
-            "jsonrpc": "2.0",
-            "id": msg_id,
-            "result": {
-                "protocolVersion": "2024-11-05",
-                "capabilities": {
-                    "tools": {}
-                },
-                "serverInfo": {
-                    "name": "text-utilities-mcp-python",
-                    "version": "1.0.0"
-                }
-            }
-        }
+    # Fast path: splice the id into a pre-serialized result
+    static_result = _STATIC_RESULTS.get(method) if isinstance(method, str) else None
+    if static_result is not None:
+        return _result_bytes(msg_id, static_result)
     
-    elif method == "notifications/initialized":
+    if method == "notifications/initialized":
         # This is a notification, no response needed
         return None
     
-    elif method == "tools/list":
-        return {
-            "jsonrpc": "2.0",
-            "id": msg_id,
-            "result": {
-                "tools": TOOLS
-            }
-        }
-    
     elif method == "tools/call":
         tool_name = params.get("name")
         arguments = params.get("arguments", {})
@@ -195,15 +220,8 @@ def handle_message(message: Dict[str, Any]) -> Optional[Dict[str, Any]]:
             "result": result
         }
     
-    elif method == "ping":
-        return {
-            "jsonrpc": "2.0",
-            "id": msg_id,
-            "result": {}
-        }
-    
     else:
-        print(f"Unknown method: {method}")
+        logger.warning("Unknown method: %s", method)
         return {
             "jsonrpc": "2.0",
             "id": msg_id,
@@ -217,80 +235,108 @@ def handle_message(message: Dict[str, Any]) -> Optional[Dict[str, Any]]:
 @app.get("/health")
 async def health():
     """Health check endpoint."""
-    return {
+    return FastJSONResponse({
         "status": "ok",
-        "name": "text-utilities-mcp-python",
-        "version": "1.0.0",
-        "tools": [tool["name"] for tool in TOOLS],
+        "name": SERVER_NAME,
+        "version": SERVER_VERSION,
+        "tools": _HEALTH_TOOL_NAMES,
         "activeSessions": len(active_sessions)
-    }
+    })
+
+async def _wait_for_disconnect(request: Request) -> None:
+    """Return once the client has disconnected."""
+    while True:
+        message = await request.receive()
+        if message["type"] == "http.disconnect":
+            return
 
 # SSE endpoint
 @app.get("/sse")
 async def sse_endpoint(request: Request):
     """SSE endpoint for MCP communication."""
-    print("New SSE connection established")
+    logger.info("New SSE connection established")
     
     # Generate session ID
-    session_id = str(uuid.uuid4())
-    print(f"Session created: {session_id}")
+    session_id = secrets.token_hex(16)
+    logger.info("Session created: %s", session_id)
     
     # Create message queue for this session
-    message_queue: asyncio.Queue = asyncio.Queue()
-    active_sessions[session_id] = message_queue
-    
-    # Get message endpoint from env or use default
-    message_endpoint = os.getenv("MESSAGE_ENDPOINT", "/message")
-    
-    # If MESSAGE_ENDPOINT is a full URL, extract just the path
-    try:
-        parsed = urlparse(message_endpoint)
-        if parsed.scheme:  # It's a full URL
-            message_endpoint = parsed.path
-        print(f"Using message endpoint: {message_endpoint}")
-    except Exception as e:
-        print(f"Using message endpoint as-is: {message_endpoint}")
+    message_queue: asyncio.Queue = asyncio.Queue(maxsize=SESSION_QUEUE_SIZE)
+    now = time.monotonic()
+    session = Session(queue=message_queue, created_at=now, last_seen=now)
+    active_sessions[session_id] = session
     
     async def event_generator():
         try:
             # Send the endpoint event with session ID
-            endpoint_url = f"{message_endpoint}?sessionId={session_id}"
-            yield {
-                "event": "endpoint",
-                "data": endpoint_url
-            }
-            print(f"Sent endpoint event: {endpoint_url}")
+            endpoint_url = ENDPOINT_URL_TEMPLATE.format(session_id=session_id)
+            yield sse_frame("endpoint", endpoint_url.encode())
+            logger.debug("Sent endpoint event: %s", endpoint_url)
             
-            # Keep connection alive and send messages from queue
-            while True:
-                try:
-                    # Check if client disconnected
-                    if await request.is_disconnected():
-                        print(f"Client disconnected: {session_id}")
-                        break
-                    
-                    # Wait for message with timeout (for keepalive)
+            # Keep connection alive and send messages from queue, racing each
+            # wait against the client going away
+            disconnect_task = asyncio.create_task(_wait_for_disconnect(request))
+            get_task: Optional[asyncio.Task] = None
+            try:
+                while True:
                     try:
-                        message = await asyncio.wait_for(message_queue.get(), timeout=30.0)
-                        yield {
-                            "event": "message",
-                            "data": json.dumps(message)
-                        }
-                        print(f"Sent message to client: {json.dumps(message)[:100]}...")
-                    except asyncio.TimeoutError:
-                        # Send keepalive comment
-                        yield {"comment": "keepalive"}
+                        if get_task is None:
+                            get_task = asyncio.create_task(message_queue.get())
                         
-                except Exception as e:
-                    print(f"Error in event generator: {e}")
-                    break
+                        # Wait for message with timeout (for keepalive)
+                        done, _ = await asyncio.wait(
+                            (get_task, disconnect_task),
+                            timeout=SSE_KEEPALIVE_INTERVAL,
+                            return_when=asyncio.FIRST_COMPLETED
+                        )
+                        
+                        if get_task in done:
+                            message = get_task.result()
+                            get_task = None
+                        elif disconnect_task in done:
+                            logger.info("Client disconnected: %s", session_id)
+                            break
+                        else:
+                            if active_sessions.get(session_id) is not session:
+                                logger.info("Session reaped, closing stream: %s", session_id)
+                                break
+                            # Send keepalive comment
+                            yield SSE_KEEPALIVE
+                            session.last_seen = time.monotonic()
+                            continue
+                        
+                        # Send anything else already queued back-to-back. Each
+                        # message stays in the queue until just before it is
+                        # sent, so SESSION_QUEUE_SIZE bounds undelivered responses.
+                        while True:
+                            data = encode_message(message)
+                            yield sse_frame("message", data)
+                            session.last_seen = time.monotonic()
+                            if logger.isEnabledFor(logging.DEBUG):
+                                logger.debug("Sent message to client: %s...", data[:100].decode(errors="replace"))
+                            try:
+                                message = message_queue.get_nowait()
+                            except asyncio.QueueEmpty:
+                                break
+                            
+                    except Exception as e:
+                        logger.error("Error in event generator: %s", e)
+                        break
+            finally:
+                disconnect_task.cancel()
+                if get_task is not None:
+                    get_task.cancel()
         finally:
             # Cleanup
-            if session_id in active_sessions:
+            if active_sessions.get(session_id) is session:
                 del active_sessions[session_id]
-                print(f"Session closed: {session_id}")
+                logger.info("Session closed: %s", session_id)
     
-    return EventSourceResponse(event_generator())
+    return StreamingResponse(
+        event_generator(),
+        media_type="text/event-stream",
+        headers=SSE_HEADERS
+    )
 
 # Message endpoint
 @app.post("/message")
@@ -299,38 +345,57 @@ async def message_endpoint(
     sessionId: str = Query(..., alias="sessionId")
 ):
     """Message endpoint for handling MCP messages."""
-    print(f"[MESSAGE] Received POST request with sessionId: {sessionId}")
-    print(f"[MESSAGE] Active sessions: {list(active_sessions.keys())}")
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("[MESSAGE] Received POST request with sessionId: %s", sessionId)
+        logger.debug("[MESSAGE] Active sessions: %s", list(active_sessions.keys()))
     
-    message_queue = active_sessions.get(sessionId)
+    session = active_sessions.get(sessionId)
     
-    if not message_queue:
-        print(f"[MESSAGE] Session not found: {sessionId}")
-        return JSONResponse(
+    if session is None:
+        logger.warning("[MESSAGE] Session not found: %s", sessionId)
+        return FastJSONResponse(
             status_code=400,
             content={"error": "No active session found"}
         )
     
+    session.last_seen = time.monotonic()
+    message_queue = session.queue
+    
     try:
-        body = await request.json()
-        print(f"[MESSAGE] Received: {json.dumps(body)[:200]}...")
+        body = orjson.loads(await request.body())
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("[MESSAGE] Received: %s...", orjson.dumps(body)[:200].decode(errors="replace"))
         
         # Handle the message
         response = handle_message(body)
         
         if response:
+            # The client may have disconnected while we were handling the message
+            if active_sessions.get(sessionId) is not session:
+                logger.info("[MESSAGE] Session closed before response was queued: %s", sessionId)
+                return FastJSONResponse(
+                    status_code=400,
+                    content={"error": "No active session found"}
+                )
+            
             # Queue the response to be sent via SSE
-            await message_queue.put(response)
-            print(f"[MESSAGE] Queued response: {json.dumps(response)[:100]}...")
+            try:
+                message_queue.put_nowait(response)
+            except asyncio.QueueFull:
+                logger.warning("[MESSAGE] Queue full, rejecting message for session: %s", sessionId)
+                return FastJSONResponse(
+                    status_code=503,
+                    content={"error": "backpressure"}
+                )
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("[MESSAGE] Queued response: %s...", encode_message(response)[:100].decode(errors="replace"))
         
         # Return accepted (the actual response goes via SSE)
         return Response(status_code=202, content="Accepted")
         
     except Exception as error:
-        print(f"Error handling message: {error}")
-        import traceback
-        traceback.print_exc()
-        return JSONResponse(
+        logger.exception("Error handling message: %s", error)
+        return FastJSONResponse(
             status_code=500,
             content={"error": str(error)}
         )
@@ -341,6 +406,16 @@ if __name__ == "__main__":
     print(f"Text Utilities MCP Python running on port {port}")
     print(f"Health check: http://localhost:{port}/health")
     print(f"SSE endpoint: http://localhost:{port}/sse")
-    print(f"Available tools: {', '.join([tool['name'] for tool in TOOLS])}")
+    print(f"Available tools: {', '.join(_HEALTH_TOOL_NAMES)}")
+    
+    limit_concurrency = os.getenv("UVICORN_LIMIT_CONCURRENCY")
     
-    uvicorn.run(app, host="0.0.0.0", port=port)
+    uvicorn.run(
+        app,
+        host="0.0.0.0",
+        port=port,
+        limit_concurrency=int(limit_concurrency) if limit_concurrency else None,
+        loop=os.getenv("UVICORN_LOOP", "uvloop"),
+        http=os.getenv("UVICORN_HTTP", "httptools"),
+        log_level=os.getenv("UVICORN_LOG_LEVEL", "warning"),
+    )
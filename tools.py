@@ -0,0 +1,141 @@
+"""
+Text utility tools exposed by the MCP server.
+Kept separate from server.py so the tool definitions and handlers are built
+once and can be imported without creating the FastAPI app.
+"""
+
+import random
+from typing import Any, Callable, Dict
+
+# Define tools
+TOOLS = [
+    {
+        "name": "reverse_text",
+        "description": "Reverses the order of characters in the given text",
+        "inputSchema": {
+            "type": "object",
+            "properties": {
+                "text": {
+                    "type": "string",
+                    "description": "The text to reverse",
+                }
+            },
+            "required": ["text"],
+        },
+    },
+    {
+        "name": "uppercase_text",
+        "description": "Converts text to uppercase",
+        "inputSchema": {
+            "type": "object",
+            "properties": {
+                "text": {
+                    "type": "string",
+                    "description": "The text to convert to uppercase",
+                }
+            },
+            "required": ["text"],
+        },
+    },
+    {
+        "name": "lowercase_text",
+        "description": "Converts text to lowercase",
+        "inputSchema": {
+            "type": "object",
+            "properties": {
+                "text": {
+                    "type": "string",
+                    "description": "The text to convert to lowercase",
+                }
+            },
+            "required": ["text"],
+        },
+    },
+    {
+        "name": "word_count",
+        "description": "Counts the number of words in the given text",
+        "inputSchema": {
+            "type": "object",
+            "properties": {
+                "text": {
+                    "type": "string",
+                    "description": "The text to count words in",
+                }
+            },
+            "required": ["text"],
+        },
+    },
+    {
+        "name": "character_count",
+        "description": "Counts the number of characters (including spaces) in the given text",
+        "inputSchema": {
+            "type": "object",
+            "properties": {
+                "text": {
+                    "type": "string",
+                    "description": "The text to count characters in",
+                }
+            },
+            "required": ["text"],
+        },
+    },
+    {
+        "name": "shuffle_text",
+        "description": "Randomly shuffles the characters in the given text",
+        "inputSchema": {
+            "type": "object",
+            "properties": {
+                "text": {
+                    "type": "string",
+                    "description": "The text to shuffle",
+                }
+            },
+            "required": ["text"],
+        },
+    },
+]
+
+def _text_result(text: str) -> Dict[str, Any]:
+    return {"content": [{"type": "text", "text": text}]}
+
+def _reverse_text(text: str) -> Dict[str, Any]:
+    return _text_result(f"Reversed text: {text[::-1]}")
+
+def _uppercase_text(text: str) -> Dict[str, Any]:
+    return _text_result(f"Uppercase: {text.upper()}")
+
+def _lowercase_text(text: str) -> Dict[str, Any]:
+    return _text_result(f"Lowercase: {text.lower()}")
+
+def _word_count(text: str) -> Dict[str, Any]:
+    count = len(text.split())
+    plural = "s" if count != 1 else ""
+    return _text_result(f"Word count: {count} word{plural}")
+
+def _character_count(text: str) -> Dict[str, Any]:
+    count = len(text)
+    plural = "s" if count != 1 else ""
+    return _text_result(f"Character count: {count} character{plural}")
+
+def _shuffle_text(text: str) -> Dict[str, Any]:
+    chars = list(text)
+    random.shuffle(chars)
+    result = "".join(chars)
+    return _text_result(f"Shuffled text: {result}")
+
+# Tool name -> handler
+HANDLERS: Dict[str, Callable[[str], Dict[str, Any]]] = {
+    "reverse_text": _reverse_text,
+    "uppercase_text": _uppercase_text,
+    "lowercase_text": _lowercase_text,
+    "word_count": _word_count,
+    "character_count": _character_count,
+    "shuffle_text": _shuffle_text,
+}
+
+def handle_tool_call(name: str, arguments: Dict[str, Any]) -> Dict[str, Any]:
+    """Handle tool execution."""
+    handler = HANDLERS.get(name)
+    if handler is None:
+        return {"content": [{"type": "text", "text": f"Unknown tool: {name}"}], "isError": True}
+    return handler(arguments.get("text", ""))